@@ -0,0 +1 @@
+"""Monitors GitHub pull requests and sends ntfy.sh notifications when their checks finish."""
@@ -0,0 +1,1020 @@
+import aiohttp
+import asyncio
+import time
+import os
+import argparse
+import sys
+import hmac
+import hashlib
+import json
+import signal
+from aiohttp import web
+from functools import lru_cache
+from urllib.parse import urlparse
+
+try:
+    # orjson parses large API responses several times faster; the standard library is the fallback
+    import orjson
+    parse_json = orjson.loads
+except ImportError:
+    parse_json = json.loads
+
+# --- Load configuration from .env file ---
+
+def load_env_file():
+    """Loads KEY=VALUE lines from the nearest .env file without overriding existing variables.
+
+    Like python-dotenv, the file is looked up in the script's directory and its parents.
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    while not os.path.isfile(os.path.join(directory, ".env")):
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return
+        directory = parent
+
+    with open(os.path.join(directory, ".env"), encoding="utf-8") as f:
+        for line in f:
+            key, sep, value = line.strip().partition("=")
+            if not sep or key.startswith("#"):
+                continue
+            value = value.strip()
+            # A quoted value ends at its closing quote, so a trailing comment after it is dropped too
+            closing = value.find(value[0], 1) if value[:1] in ("\"", "'") else -1
+            if closing != -1:
+                value = value[1:closing]
+            else:
+                value = value.split(" #", 1)[0].strip()
+            os.environ.setdefault(key.strip().removeprefix("export "), value)
+
+load_env_file()
+
+# --- Configuration ---
+# The script prioritizes environment variables, falling back to the .env file.
+GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
+NTFY_TOPIC = os.getenv("NTFY_TOPIC")
+POLL_INTERVAL = int(os.getenv("POLL_INTERVAL", 60))
+MAX_POLL_INTERVAL = int(os.getenv("MAX_POLL_INTERVAL") or 600)
+GITHUB_ENTERPRISE_URL = os.getenv("GITHUB_ENTERPRISE_URL")
+REPO_URL_FROM_ENV = os.getenv("REPO_URL")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT") or 8080)
+STATE_FILE = os.path.expanduser(os.getenv("STATE_FILE") or "~/.cache/pr-notifier/state.json")
+
+# Webhook events that can change the check status of a PR.
+WEBHOOK_EVENTS = ("check_suite", "check_run", "pull_request")
+
+# Authentication for GitHub API requests. Sent per request so it never reaches ntfy.sh.
+GITHUB_HEADERS = {"Authorization": f"token {GITHUB_TOKEN}", "Accept": "application/vnd.github.v3+json"}
+
+# ntfy.sh endpoint and the headers shared by every notification.
+NTFY_BASE_URL = "https://ntfy.sh"
+NTFY_BASE_HEADERS = {"Priority": "high"}
+
+# Conclusions of completed check runs that count as passing.
+PASSING_CONCLUSIONS = frozenset({"success", "skipped", "neutral"})
+
+# Maximum number of concurrent connections, shared by GitHub and ntfy.sh requests.
+MAX_CONNECTIONS = 20
+
+# Retry policy for transient GitHub API and ntfy.sh failures.
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.5
+RETRY_STATUSES = (502, 503, 504)
+
+# Pause requests until the rate limit resets once fewer than this many requests remain.
+RATE_LIMIT_THRESHOLD = 50
+
+# Maximum number of URLs kept in the ETag cache.
+ETAG_CACHE_SIZE = 512
+
+# Maximum number of commits kept in the cache of finished check runs.
+TERMINAL_CACHE_SIZE = 256
+
+# Last ETag, Last-Modified and decoded body per GitHub API URL, used for conditional requests.
+etag_cache = {}
+
+# GraphQL endpoints that do not exist (HTTP 404), so REST is used right away.
+graphql_unavailable = set()
+
+# Check data of commits whose checks have all completed, keyed by (owner, repo, sha).
+terminal_cache = {}
+
+# Whether the state or a persisted ETag cache entry changed since STATE_FILE was last written.
+state_changed = False
+
+# Minimum poll interval requested by GitHub through the X-Poll-Interval header.
+server_poll_interval = 0
+
+# Epoch time until which GitHub requests are paused because of rate limiting, keyed by
+# (API host, rate limit resource) since every host and resource has its own budget.
+rate_limited_until = {}
+
+# Check runs of a commit's status rollup, shared by the GraphQL queries.
+CHECK_ROLLUP_FRAGMENT = """
+fragment checkRollup on Commit {
+  oid
+  statusCheckRollup {
+    contexts(first: 100) {
+      pageInfo { hasNextPage }
+      nodes {
+        __typename
+        ... on CheckRun { name status conclusion }
+      }
+    }
+  }
+}
+"""
+
+
+# --- Helper Functions ---
+# The URL helpers only ever see a handful of distinct URLs, so their results are cached.
+
+@lru_cache(maxsize=256)
+def get_api_base_url(repo_url_str):
+    """Determines the correct API base URL for public or enterprise GitHub."""
+    if GITHUB_ENTERPRISE_URL:
+        return f"{GITHUB_ENTERPRISE_URL}/api/v3"
+
+    parsed_url = urlparse(repo_url_str)
+    if parsed_url.hostname and parsed_url.hostname != "github.com":
+        return f"{parsed_url.scheme}://{parsed_url.hostname}/api/v3"
+
+    return "https://api.github.com"
+
+@lru_cache(maxsize=256)
+def parse_repo_url(url):
+    """Extracts the owner and repository name from a repository URL."""
+    try:
+        path_parts = urlparse(url).path.strip("/").split("/")
+        if len(path_parts) >= 2:
+            owner = path_parts[0]
+            repo = path_parts[1].replace('.git', '')
+            return owner, repo
+    except (ValueError, IndexError):
+        pass
+    return None, None
+
+@lru_cache(maxsize=256)
+def parse_pr_url(url):
+    """Extracts the owner, repository, and PR number from a pull request URL."""
+    try:
+        path_parts = urlparse(url).path.strip("/").split("/")
+        if len(path_parts) >= 4 and path_parts[2] == "pull":
+            owner = path_parts[0]
+            repo = path_parts[1]
+            pr_number = int(path_parts[3])
+            return owner, repo, pr_number
+    except (ValueError, IndexError):
+        pass
+    return None, None, None
+
+@lru_cache(maxsize=256)
+def get_graphql_url(api_base_url):
+    """Determines the GraphQL endpoint that belongs to a REST API base URL."""
+    if api_base_url.endswith("/api/v3"):
+        return f"{api_base_url[:-len('/api/v3')]}/api/graphql"
+    return f"{api_base_url}/graphql"
+
+@lru_cache(maxsize=256)
+def is_pr_url(url):
+    """Checks if the given URL is a pull request URL."""
+    try:
+        path = urlparse(url).path
+        return "/pull/" in path
+    except:
+        return False
+
+def is_event_for_repo(payload, owner, repo):
+    """Checks if a webhook payload belongs to the given repository."""
+    full_name = payload.get("repository", {}).get("full_name", "")
+    return full_name.lower() == f"{owner}/{repo}".lower()
+
+def get_event_pull_requests(event, payload):
+    """Returns (pr_number, commit_sha) pairs for PRs whose checks completed in a webhook event."""
+    if event not in ("check_suite", "check_run") or payload.get("action") != "completed":
+        return []
+    return [(pr["number"], pr["head"]["sha"]) for pr in payload[event].get("pull_requests", [])]
+
+def is_persisted_url(url):
+    """Checks if the ETag cache entry of a URL is kept in STATE_FILE.
+
+    Check runs are looked up per commit SHA and rarely outlive a restart, so their bodies
+    are not worth writing out.
+    """
+    return "/check-runs" not in url
+
+def mark_state_changed():
+    """Flags the state for the next save_state call."""
+    global state_changed
+    state_changed = True
+
+def load_state():
+    """Loads the state persisted by a previous run and restores its ETag cache."""
+    try:
+        with open(STATE_FILE, encoding="utf-8") as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return {"repos": {}}
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Ignoring unreadable state file {STATE_FILE}: {e}", file=sys.stderr)
+        return {"repos": {}}
+
+    etag_cache.update(state.pop("etags", {}))
+    return state
+
+def get_target_state(state, owner, repo, ntfy_url):
+    """Returns the persisted state of a repository as seen by the monitors notifying `ntfy_url`.
+
+    Each ntfy topic keeps its own record of what was notified, so monitoring a repository for
+    several topics notifies every one of them.
+    """
+    return state["repos"].setdefault(f"{owner}/{repo}", {}).setdefault(ntfy_url, {})
+
+def save_state(state):
+    """Atomically writes the state and the ETag cache to STATE_FILE if they changed."""
+    global state_changed
+    if not state_changed:
+        return
+
+    etags = {url: entry for url, entry in etag_cache.items() if is_persisted_url(url)}
+    try:
+        os.makedirs(os.path.dirname(STATE_FILE), exist_ok=True)
+        tmp_file = f"{STATE_FILE}.{os.getpid()}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({**state, "etags": etags}, f)
+        os.replace(tmp_file, STATE_FILE)
+        state_changed = False
+    except OSError as e:
+        print(f"⚠️ Could not save state to {STATE_FILE}: {e}", file=sys.stderr)
+
+def get_rate_limit_key(url):
+    """Determines the (host, resource) rate limit bucket a GitHub API request is counted against."""
+    parsed_url = urlparse(url)
+    resource = "graphql" if parsed_url.path.endswith("/graphql") else "core"
+    return parsed_url.hostname, resource
+
+def note_rate_limit(response, rate_limit_key):
+    """Records the rate limit reported by a GitHub response. Returns True if it was throttled."""
+    until = rate_limited_until.get(rate_limit_key, 0)
+    remaining = response.headers.get("X-RateLimit-Remaining")
+    reset = response.headers.get("X-RateLimit-Reset")
+    if remaining is not None and reset is not None and int(remaining) < RATE_LIMIT_THRESHOLD:
+        until = max(until, int(reset) + 1)
+
+    throttled = False
+    if response.status in (403, 429):
+        retry_after = response.headers.get("Retry-After")
+        if retry_after is not None:
+            until = max(until, time.time() + int(retry_after))
+            throttled = True
+        else:
+            throttled = remaining == "0"
+
+    if until:
+        rate_limited_until[rate_limit_key] = until
+    return throttled
+
+async def wait_for_rate_limit(rate_limit_key):
+    """Pauses until a rate limit reported by GitHub for this host and resource has reset."""
+    delay = rate_limited_until.get(rate_limit_key, 0) - time.time()
+    if delay > 0:
+        host, resource = rate_limit_key
+        print(f"⏳ GitHub rate limit reached for {resource} requests to {host}. Pausing them for {delay:.0f}s.")
+        await asyncio.sleep(delay)
+
+async def read_json(response):
+    """Decodes a JSON response body.
+
+    A body that is not JSON (such as a proxy's HTML login page) raises aiohttp's
+    ContentTypeError, like response.json() would, so API error handlers also cover it.
+    """
+    try:
+        return parse_json(await response.read())
+    except ValueError as e:
+        raise aiohttp.ContentTypeError(
+            response.request_info,
+            response.history,
+            status=response.status,
+            message=f"Invalid JSON response body: {e}",
+            headers=response.headers
+        ) from e
+
+async def gh_request(session, method, url, headers=None, json_body=None):
+    """Sends a GitHub API request, honoring rate limits and retrying transient failures.
+
+    Returns the (already released) response and its decoded JSON body, which is None for a 304.
+    """
+    global server_poll_interval
+    rate_limit_key = get_rate_limit_key(url)
+    for attempt in range(MAX_RETRIES + 1):
+        await wait_for_rate_limit(rate_limit_key)
+        throttled = False
+        try:
+            async with session.request(method, url, headers={**GITHUB_HEADERS, **(headers or {})}, json=json_body) as response:
+                if "X-Poll-Interval" in response.headers:
+                    server_poll_interval = int(response.headers["X-Poll-Interval"])
+                # GitHub names the resource the request was counted against
+                host, resource = rate_limit_key
+                rate_limit_key = (host, response.headers.get("X-RateLimit-Resource", resource))
+                throttled = note_rate_limit(response, rate_limit_key)
+                if not (throttled or response.status in RETRY_STATUSES) or attempt == MAX_RETRIES:
+                    response.raise_for_status()
+                    body = None if response.status == 304 else await read_json(response)
+                    return response, body
+        except aiohttp.ClientConnectionError:
+            if attempt == MAX_RETRIES:
+                raise
+        # Throttled requests are retried once wait_for_rate_limit lets them through
+        if not throttled:
+            await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+
+async def gh_get_page(session, url):
+    """Fetches a GitHub API URL and returns the decoded JSON body and the URL of the next page.
+
+    Responses are remembered by ETag and Last-Modified, so an unchanged resource comes back
+    as a 304 (which does not count against the rate limit) and is served from etag_cache
+    without re-parsing.
+    """
+    cached = etag_cache.get(url)
+    headers = {}
+    if cached and cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+    if cached and cached.get("last_modified"):
+        headers["If-Modified-Since"] = cached["last_modified"]
+    response, data = await gh_request(session, "GET", url, headers=headers)
+    if response.status == 304 and cached:
+        # Mark the entry as most recently used
+        etag_cache[url] = etag_cache.pop(url, cached)
+        return cached["data"], cached.get("next")
+
+    next_link = response.links.get("next")
+    next_url = str(next_link["url"]) if next_link else None
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if etag or last_modified:
+        etag_cache.pop(url, None)
+        etag_cache[url] = {"etag": etag, "last_modified": last_modified, "data": data, "next": next_url}
+        if is_persisted_url(url):
+            mark_state_changed()
+        if len(etag_cache) > ETAG_CACHE_SIZE:
+            # Evict the least recently used entry
+            del etag_cache[next(iter(etag_cache))]
+    return data, next_url
+
+async def gh_get(session, url):
+    """Fetches a GitHub API URL and returns the decoded JSON body."""
+    data, _ = await gh_get_page(session, url)
+    return data
+
+async def gh_get_all(session, url, items_key=None):
+    """Fetches every page of a GitHub API list by following the Link headers.
+
+    For responses that wrap the list in an object, `items_key` names the list; the first
+    page's object is returned with the items of all pages.
+    """
+    data, url = await gh_get_page(session, url)
+    items = list(data if items_key is None else data[items_key])
+    while url:
+        page, url = await gh_get_page(session, url)
+        items.extend(page if items_key is None else page[items_key])
+    return items if items_key is None else {**data, items_key: items}
+
+async def gh_graphql(session, api_base_url, query, variables):
+    """Runs a GitHub GraphQL query. Returns its data, or None if the query failed."""
+    graphql_url = get_graphql_url(api_base_url)
+    if graphql_url in graphql_unavailable:
+        return None
+
+    try:
+        _, result = await gh_request(session, "POST", graphql_url, json_body={"query": query, "variables": variables})
+    except aiohttp.ClientResponseError as e:
+        if e.status == 404:
+            graphql_unavailable.add(graphql_url)
+        print(f"⚠️ GraphQL query failed: {e}. Falling back to REST.", file=sys.stderr)
+        return None
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        print(f"⚠️ GraphQL query failed: {e}. Falling back to REST.", file=sys.stderr)
+        return None
+
+    if result.get("errors"):
+        messages = "; ".join(error.get("message", "unknown error") for error in result["errors"])
+        print(f"⚠️ GraphQL query failed: {messages}. Falling back to REST.", file=sys.stderr)
+        return None
+    return result.get("data")
+
+def parse_check_rollup(pr, commit_sha):
+    """Converts the head commit's statusCheckRollup of a GraphQL PR into the REST check-runs shape.
+
+    Returns None if the head is no longer `commit_sha`, or if there are too many checks for one
+    page of the rollup; such PRs are left to the REST lookup.
+    """
+    commits = pr["commits"]["nodes"] if pr else []
+    if not commits or commits[0]["commit"]["oid"] != commit_sha:
+        return None
+    rollup = commits[0]["commit"]["statusCheckRollup"]
+    if rollup is None:
+        return {"total_count": 0, "check_runs": []}
+    if rollup["contexts"]["pageInfo"]["hasNextPage"]:
+        return None
+
+    check_runs = [
+        {
+            "name": node["name"],
+            "status": node["status"].lower(),
+            "conclusion": node["conclusion"].lower() if node["conclusion"] else None,
+        }
+        for node in rollup["contexts"]["nodes"]
+        if node["__typename"] == "CheckRun"
+    ]
+    return {"total_count": len(check_runs), "check_runs": check_runs}
+
+async def fetch_check_runs_batch(session, api_base_url, owner, repo, commit_shas):
+    """Fetches the check runs of several PRs with a single GraphQL query.
+
+    `commit_shas` maps PR numbers to their monitored head SHA. Returns REST-shaped check data
+    for each PR whose head still matches; PRs missing from the result need a REST lookup.
+    """
+    if not commit_shas:
+        return {}
+
+    aliases = " ".join(
+        f"pr{pr_number}: pullRequest(number: {pr_number}) {{ commits(last: 1) {{ nodes {{ commit {{ ...checkRollup }} }} }} }}"
+        for pr_number in commit_shas
+    )
+    query = f"query($owner: String!, $name: String!) {{ repository(owner: $owner, name: $name) {{ {aliases} }} }}" + CHECK_ROLLUP_FRAGMENT
+
+    data = await gh_graphql(session, api_base_url, query, {"owner": owner, "name": repo})
+    if data is None:
+        return {}
+
+    check_data = {}
+    for pr_number, commit_sha in commit_shas.items():
+        pr_check_data = parse_check_rollup(data["repository"].get(f"pr{pr_number}"), commit_sha)
+        if pr_check_data is not None:
+            check_data[pr_number] = pr_check_data
+    return check_data
+
+async def graphql_fetch_open_prs(session, api_base_url, owner, repo):
+    """Fetches the open PRs of a repository together with their head commit's check runs.
+
+    Returns the PRs in the REST /pulls shape and a dict of PR number to REST-shaped check data,
+    or None if GraphQL is unavailable. PRs missing from the check data need a separate lookup.
+    """
+    query = """
+    query($owner: String!, $name: String!, $after: String) {
+      repository(owner: $owner, name: $name) {
+        pullRequests(states: OPEN, first: 100, after: $after) {
+          pageInfo { hasNextPage endCursor }
+          nodes {
+            number
+            title
+            headRefOid
+            commits(last: 1) { nodes { commit { ...checkRollup } } }
+          }
+        }
+      }
+    }
+    """ + CHECK_ROLLUP_FRAGMENT
+
+    open_prs, check_data = [], {}
+    variables = {"owner": owner, "name": repo, "after": None}
+    while True:
+        data = await gh_graphql(session, api_base_url, query, variables)
+        if data is None:
+            return None
+
+        pull_requests = data["repository"]["pullRequests"]
+        for pr in pull_requests["nodes"]:
+            open_prs.append({"number": pr["number"], "title": pr["title"], "head": {"sha": pr["headRefOid"]}})
+            pr_check_data = parse_check_rollup(pr, pr["headRefOid"])
+            if pr_check_data is not None:
+                remember_if_terminal(owner, repo, pr["headRefOid"], pr_check_data)
+                check_data[pr["number"]] = pr_check_data
+
+        if not pull_requests["pageInfo"]["hasNextPage"]:
+            return open_prs, check_data
+        variables["after"] = pull_requests["pageInfo"]["endCursor"]
+
+def remember_if_terminal(owner, repo, commit_sha, check_data):
+    """Caches the check data of a commit once all of its checks have completed."""
+    total_checks = check_data.get("total_count", 0)
+    completed = sum(1 for run in check_data.get("check_runs", []) if run["status"] == "completed")
+    if total_checks == 0 or completed != total_checks:
+        return
+
+    terminal_cache[(owner, repo, commit_sha)] = check_data
+    if len(terminal_cache) > TERMINAL_CACHE_SIZE:
+        del terminal_cache[next(iter(terminal_cache))]
+
+async def fetch_check_runs(session, api_base_url, owner, repo, commit_sha):
+    """Fetches the check runs of a commit over REST, unless they are known to be finished."""
+    cached = terminal_cache.get((owner, repo, commit_sha))
+    if cached is not None:
+        return cached
+
+    # filter=latest is GitHub's default; it is spelled out because only the latest run of each check counts
+    check_runs_url = f"{api_base_url}/repos/{owner}/{repo}/commits/{commit_sha}/check-runs?filter=latest&per_page=100"
+    check_data = await gh_get_all(session, check_runs_url, "check_runs")
+    remember_if_terminal(owner, repo, commit_sha, check_data)
+    return check_data
+
+async def fetch_check_data(session, api_base_url, owner, repo, commit_shas):
+    """Fetches the check runs of several PRs, looking up over REST whatever GraphQL could not answer.
+
+    Commits whose checks already finished are answered from terminal_cache without any request.
+    Returns a dict of PR number to check data, or to the exception that prevented fetching it.
+    """
+    check_data = {
+        pr_number: terminal_cache[(owner, repo, commit_sha)]
+        for pr_number, commit_sha in commit_shas.items()
+        if (owner, repo, commit_sha) in terminal_cache
+    }
+    uncached = {pr_number: commit_sha for pr_number, commit_sha in commit_shas.items() if pr_number not in check_data}
+
+    batch = await fetch_check_runs_batch(session, api_base_url, owner, repo, uncached)
+    for pr_number, data in batch.items():
+        remember_if_terminal(owner, repo, uncached[pr_number], data)
+    check_data.update(batch)
+
+    missing = [pr_number for pr_number in uncached if pr_number not in batch]
+    results = await asyncio.gather(
+        *[fetch_check_runs(session, api_base_url, owner, repo, uncached[pr_number]) for pr_number in missing],
+        return_exceptions=True
+    )
+    check_data.update(zip(missing, results))
+    return check_data
+
+async def send_notification(session, ntfy_url, title, message, tags):
+    """Sends a push notification via ntfy.sh, retrying transient failures. Returns True if it was delivered."""
+    body = message.encode('utf-8')
+    headers = {**NTFY_BASE_HEADERS, "Title": title, "Tags": tags}
+    for attempt in range(MAX_RETRIES + 1):
+        delay = RETRY_BACKOFF * 2 ** attempt
+        try:
+            async with session.post(ntfy_url, data=body, headers=headers) as response:
+                if response.status < 400:
+                    print(f"✅ Notification sent successfully for: {title}")
+                    return True
+                error = f"ntfy.sh responded with HTTP {response.status}"
+                if response.status != 429 and response.status not in RETRY_STATUSES:
+                    break
+                retry_after = response.headers.get("Retry-After", "")
+                if retry_after.isdigit():
+                    delay = int(retry_after)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            error = e
+        if attempt < MAX_RETRIES:
+            await asyncio.sleep(delay)
+
+    print(f"❌ Error sending notification: {error}", file=sys.stderr)
+    return False
+
+async def check_and_notify(session, ntfy_url, pr_number, pr_title, check_data):
+    """Checks the status of a PR's head commit and sends a notification upon completion."""
+    total_checks = check_data.get("total_count", 0)
+    if total_checks == 0:
+        return "pending", False # No checks initiated yet, not completed
+
+    # Count completed checks and collect failures in a single pass
+    completed_count = 0
+    failures = []
+    for run in check_data.get("check_runs", []):
+        if run["status"] == "completed":
+            completed_count += 1
+            if run["conclusion"] not in PASSING_CONCLUSIONS:
+                failures.append(run)
+
+    if completed_count == total_checks:
+        if failures:
+            conclusion, tags = "Failure", "x"
+            failed_names = ", ".join([f'"{f["name"]}"' for f in failures])
+            message = f"Checks failed: {failed_names}"
+        else:
+            conclusion, tags = "Success", "tada"
+            message = f"All {total_checks} checks passed!"
+
+        print(f"🎉 PR #{pr_number} '{pr_title}' finished with conclusion: {conclusion}")
+        title = f"PR #{pr_number} {pr_title} Check: {conclusion}"
+        # An undelivered notification leaves the PR pending, so it is sent again on the next check
+        delivered = await send_notification(session, ntfy_url, title, message, tags)
+        return conclusion, delivered
+
+    return "in_progress", False # Still in progress
+
+# --- Webhook Receiver ---
+
+def verify_signature(body, signature_header):
+    """Validates the X-Hub-Signature-256 header against the configured webhook secret."""
+    if not signature_header or not signature_header.startswith("sha256="):
+        return False
+    expected = hmac.new(WEBHOOK_SECRET.encode('utf-8'), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(f"sha256={expected}", signature_header)
+
+async def start_webhook_server(event_queues):
+    """Starts the webhook listener on /webhook.
+
+    Relevant events are dispatched by repository to `event_queues`, which maps lower-cased
+    "owner/repo" names to the queues of the monitors watching that repository.
+    """
+
+    async def handle_webhook(request):
+        body = await request.read()
+        if not verify_signature(body, request.headers.get("X-Hub-Signature-256")):
+            return web.Response(status=401)
+
+        event = request.headers.get("X-GitHub-Event")
+        if event in WEBHOOK_EVENTS:
+            try:
+                payload = parse_json(body)
+            except ValueError:
+                return web.Response(status=400)
+            full_name = payload.get("repository", {}).get("full_name", "")
+            for event_queue in event_queues.get(full_name.lower(), []):
+                event_queue.put_nowait((event, payload))
+        return web.Response(status=202)
+
+    app = web.Application()
+    app.router.add_post("/webhook", handle_webhook)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, port=WEBHOOK_PORT).start()
+    print(f"📡 Listening for GitHub webhooks on port {WEBHOOK_PORT} at /webhook")
+    return runner
+
+def next_poll_interval(stable_ticks):
+    """Doubles the poll interval for every tick without changes, up to MAX_POLL_INTERVAL."""
+    sleep_for = min(POLL_INTERVAL * 2 ** stable_ticks, max(MAX_POLL_INTERVAL, POLL_INTERVAL))
+    return max(sleep_for, server_poll_interval)
+
+async def wait_for_event(event_queue, sleep_for, accept):
+    """Waits for the next webhook event matching `accept`. Returns None when it is time to poll.
+
+    A `sleep_for` of None waits for webhook events only.
+    """
+    if event_queue is None:
+        await asyncio.sleep(sleep_for)
+        return None
+
+    deadline = time.monotonic() + sleep_for if sleep_for is not None else None
+    while True:
+        timeout = max(deadline - time.monotonic(), 0) if deadline else None
+        try:
+            event, payload = await asyncio.wait_for(event_queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if accept(event, payload):
+            return event, payload
+
+# --- Monitoring ---
+
+async def monitor_single_pr(session, state, pr_url, api_base_url, ntfy_url, event_queue=None, poll=True):
+    """Monitors a single PR, automatically detecting new commits.
+
+    The PR is re-checked on every matching webhook event when an event queue is given,
+    and polled when `poll` is set, backing off while nothing changes. Notified commits are
+    kept in `state` so a restart does not notify them again.
+    """
+    owner, repo, pr_number = parse_pr_url(pr_url)
+    if not all([owner, repo, pr_number]):
+        print(f"❌ Error: Invalid GitHub PR URL: {pr_url}", file=sys.stderr)
+        return
+
+    print(f"🚀 Starting to monitor single PR: {owner}/{repo} #{pr_number}")
+
+    repo_state = get_target_state(state, owner, repo, ntfy_url)
+    monitored_commit_sha = None
+    notified_shas = set(repo_state.get("notified_shas", []))
+    event = None
+    last_snapshot = None
+    stable_ticks = 0
+
+    def accept(event, payload):
+        if not is_event_for_repo(payload, owner, repo):
+            return False
+        if event == "pull_request":
+            return payload["pull_request"]["number"] == pr_number
+        return any(number == pr_number for number, _ in get_event_pull_requests(event, payload))
+
+    try:
+        while True:
+            if event is None or event[0] == "pull_request":
+                if event is None:
+                    pr_api_url = f"{api_base_url}/repos/{owner}/{repo}/pulls/{pr_number}"
+                    pr_data = await gh_get(session, pr_api_url)
+                else:
+                    pr_data = event[1]["pull_request"]
+
+                latest_commit_sha = pr_data["head"]["sha"]
+                pr_title = pr_data["title"]
+
+                # Stop if the PR has been closed or merged
+                if pr_data.get("state") != "open":
+                    print(f"🚮 PR #{pr_number} is closed or merged. Stopping.")
+                    break
+
+                if monitored_commit_sha != latest_commit_sha:
+                    monitored_commit_sha = latest_commit_sha
+                    print(f"🔗 Now monitoring commit SHA: {monitored_commit_sha[:7]} for PR '{pr_title}'")
+
+                should_check = True
+            else:
+                # Ignore check events for commits that are no longer the PR head
+                should_check = (pr_number, monitored_commit_sha) in get_event_pull_requests(*event)
+
+            check_data = None
+            if not should_check:
+                pass
+            elif monitored_commit_sha in notified_shas:
+                print(f"✅ Status for commit {monitored_commit_sha[:7]} already sent. Waiting for new commits...")
+            else:
+                print(f"🔍 Checking status for commit {monitored_commit_sha[:7]}...")
+                check_data = await fetch_check_runs(session, api_base_url, owner, repo, monitored_commit_sha)
+                conclusion, is_completed = await check_and_notify(session, ntfy_url, pr_number, pr_title, check_data)
+                if is_completed:
+                    notified_shas.add(monitored_commit_sha)
+                    # Monitors of other PRs in the repository share the list, so merge rather than overwrite it
+                    notified_shas.update(repo_state.get("notified_shas", []))
+                    repo_state["notified_shas"] = sorted(notified_shas)
+                    mark_state_changed()
+
+            save_state(state)
+
+            # Back off while polls see neither a new commit nor a check status change
+            snapshot = (monitored_commit_sha, check_data)
+            stable_ticks = stable_ticks + 1 if event is None and snapshot == last_snapshot else 0
+            last_snapshot = snapshot
+            event = await wait_for_event(event_queue, next_poll_interval(stable_ticks) if poll else None, accept)
+
+    except aiohttp.ClientResponseError as e:
+        # Handle cases where the PR is deleted
+        if e.status == 404:
+            print(f"❌ PR #{pr_number} not found. It might have been deleted. Stopping.")
+        else:
+            print(f"❌ An API error occurred: {e}.", file=sys.stderr)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        print(f"❌ An API error occurred: {e}.", file=sys.stderr)
+
+def track_pr(monitored_prs, pr_number, commit_sha, pr_title):
+    """Starts monitoring an open PR, or resets its status when a new commit was pushed."""
+    data = monitored_prs.get(pr_number)
+    if data is None:
+        print(f"👀 New PR detected: #{pr_number} '{pr_title}'. Now monitoring.")
+        monitored_prs[pr_number] = {"sha": commit_sha, "title": pr_title, "notified": False}
+        mark_state_changed()
+        return
+
+    if data["sha"] != commit_sha:
+        print(f"🔄 New commit on PR #{pr_number} '{pr_title}'. Resetting status.")
+        data["sha"] = commit_sha
+        data["notified"] = False
+        mark_state_changed()
+    if data["title"] != pr_title:
+        data["title"] = pr_title
+        mark_state_changed()
+
+async def refresh_open_prs(session, api_base_url, owner, repo, monitored_prs):
+    """Syncs monitored_prs with the open PRs of the repository.
+
+    Returns the PR numbers to check and the check data that arrived along with the PR list.
+    """
+    discovered = await graphql_fetch_open_prs(session, api_base_url, owner, repo)
+    if discovered is not None:
+        open_prs_data, check_data = discovered
+    else:
+        prs_api_url = f"{api_base_url}/repos/{owner}/{repo}/pulls?state=open&per_page=100"
+        open_prs_data, check_data = await gh_get_all(session, prs_api_url), {}
+
+    for pr in open_prs_data:
+        track_pr(monitored_prs, pr["number"], pr["head"]["sha"], pr["title"])
+
+    # The key difference is a new set, so deleting while iterating it is safe
+    for pr_number in monitored_prs.keys() - {pr["number"] for pr in open_prs_data}:
+        print(f"🚮 PR #{pr_number} is closed or merged. Removing from monitoring.")
+        del monitored_prs[pr_number]
+        mark_state_changed()
+
+    if not monitored_prs:
+        print("No open PRs to monitor. Waiting...")
+    else:
+        print(f"🔍 Checking status for {len(monitored_prs)} open PR(s): {list(monitored_prs)}")
+
+    return list(monitored_prs), check_data
+
+async def apply_repo_event(session, event, payload, api_base_url, owner, repo, monitored_prs):
+    """Updates monitored_prs from a webhook event. Returns the PR numbers whose checks completed."""
+    if event == "pull_request":
+        pr = payload["pull_request"]
+        if pr["state"] != "open":
+            if monitored_prs.pop(pr["number"], None) is not None:
+                print(f"🚮 PR #{pr['number']} is closed or merged. Removing from monitoring.")
+                mark_state_changed()
+        else:
+            track_pr(monitored_prs, pr["number"], pr["head"]["sha"], pr["title"])
+        return []
+
+    pr_numbers = []
+    for pr_number, commit_sha in get_event_pull_requests(event, payload):
+        if pr_number not in monitored_prs or monitored_prs[pr_number]["sha"] != commit_sha:
+            # A pull_request event was missed; look up the current head of the PR.
+            pr_api_url = f"{api_base_url}/repos/{owner}/{repo}/pulls/{pr_number}"
+            pr_data = await gh_get(session, pr_api_url)
+            if pr_data["state"] != "open":
+                continue
+            track_pr(monitored_prs, pr_number, pr_data["head"]["sha"], pr_data["title"])
+
+        # Ignore check events for commits that are no longer the PR head
+        if monitored_prs[pr_number]["sha"] == commit_sha:
+            pr_numbers.append(pr_number)
+    return pr_numbers
+
+async def monitor_repository(session, state, repo_url, api_base_url, ntfy_url, event_queue=None, poll=True):
+    """Monitors all open PRs within a repository.
+
+    Open PRs are re-synced when `poll` is set, backing off while nothing changes. With an event
+    queue, webhook events update the monitored PRs and trigger checks as soon as they arrive. The
+    monitored PRs are kept in `state` so a restart resumes where the last run stopped.
+    """
+    owner, repo = parse_repo_url(repo_url)
+    if not all([owner, repo]):
+        print(f"❌ Error: Invalid GitHub Repo URL: {repo_url}", file=sys.stderr)
+        return
+
+    print(f"🚀 Starting to monitor all PRs in repository: {owner}/{repo}")
+    repo_state = get_target_state(state, owner, repo, ntfy_url)
+    # JSON object keys are strings; PR numbers are ints everywhere else.
+    monitored_prs = {int(pr_number): data for pr_number, data in repo_state.get("monitored_prs", {}).items()}
+    repo_state["monitored_prs"] = monitored_prs
+    if monitored_prs:
+        print(f"💾 Restored {len(monitored_prs)} monitored PR(s) from {STATE_FILE}")
+    event = None
+    last_snapshot = None
+    stable_ticks = 0
+
+    def accept(event, payload):
+        return is_event_for_repo(payload, owner, repo)
+
+    while True:
+        try:
+            if event is None:
+                pr_numbers, check_data = await refresh_open_prs(session, api_base_url, owner, repo, monitored_prs)
+            else:
+                pr_numbers, check_data = await apply_repo_event(session, *event, api_base_url, owner, repo, monitored_prs), {}
+
+            # Fetch the checks of all pending PRs not answered yet at once, then evaluate them
+            # concurrently; one failing lookup must not drop the others' results.
+            pending = [(pr_number, monitored_prs[pr_number]) for pr_number in pr_numbers if not monitored_prs[pr_number]["notified"]]
+            check_data = {pr_number: check_data[pr_number] for pr_number, _ in pending if pr_number in check_data}
+            missing = {pr_number: data["sha"] for pr_number, data in pending if pr_number not in check_data}
+            check_data.update(await fetch_check_data(session, api_base_url, owner, repo, missing))
+            for pr_number, result in check_data.items():
+                if isinstance(result, Exception):
+                    print(f"❌ An API error occurred for PR #{pr_number}: {result}. Retrying...", file=sys.stderr)
+            pending = [(pr_number, data) for pr_number, data in pending if not isinstance(check_data[pr_number], Exception)]
+            results = await asyncio.gather(
+                *[check_and_notify(session, ntfy_url, pr_number, data["title"], check_data[pr_number]) for pr_number, data in pending]
+            )
+            for (pr_number, data), (conclusion, is_completed) in zip(pending, results):
+                if is_completed:
+                    data["notified"] = True
+                    mark_state_changed()
+
+            snapshot = ({pr_number: data["sha"] for pr_number, data in monitored_prs.items()}, check_data)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"❌ An API error occurred: {e}. Retrying...", file=sys.stderr)
+            snapshot = None
+
+        save_state(state)
+
+        # Back off while polls see neither PR changes nor check status changes
+        stable_ticks = stable_ticks + 1 if event is None and snapshot == last_snapshot else 0
+        last_snapshot = snapshot
+        event = await wait_for_event(event_queue, next_poll_interval(stable_ticks) if poll else None, accept)
+
+def load_targets(config_path):
+    """Reads the repositories or PRs to monitor from a JSON config file.
+
+    The file holds a list of {"repo_url": ..., "ntfy_topic": ...} objects; a missing
+    ntfy_topic falls back to NTFY_TOPIC.
+    """
+    try:
+        with open(config_path, encoding="utf-8") as f:
+            entries = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"❌ Error: Could not read config file {config_path}: {e}")
+        sys.exit(1)
+
+    if not isinstance(entries, list) or not all(isinstance(entry, dict) and entry.get("repo_url") for entry in entries):
+        print(f"❌ Error: {config_path} must contain a list of objects with a \"repo_url\".")
+        sys.exit(1)
+    return [{"repo_url": entry["repo_url"], "ntfy_topic": entry.get("ntfy_topic") or NTFY_TOPIC} for entry in entries]
+
+async def main():
+    parser = argparse.ArgumentParser(description="Monitor GitHub PRs and send notifications.")
+    parser.add_argument("url", nargs='?', default=None, help="The full URL of the GitHub Repository or a specific Pull Request. Reads from .env if not provided.")
+    parser.add_argument("--poll-fallback", action="store_true", help="Keep polling every POLL_INTERVAL seconds as a backstop when receiving webhooks.")
+    parser.add_argument("--config", help="JSON file listing several repositories or PRs to monitor in one process.")
+    args = parser.parse_args()
+
+    # --- Validate required configuration ---
+    if not GITHUB_TOKEN:
+        print("❌ Error: GITHUB_TOKEN not found. Please set it in your environment or a .env file.")
+        sys.exit(1)
+
+    if args.config:
+        targets = load_targets(args.config)
+    else:
+        target_url = args.url if args.url else REPO_URL_FROM_ENV
+        if not target_url:
+            print("❌ Error: No URL provided via command line or in .env file (REPO_URL).")
+            sys.exit(1)
+        targets = [{"repo_url": target_url, "ntfy_topic": NTFY_TOPIC}]
+
+    if not all(target["ntfy_topic"] for target in targets):
+        print("❌ Error: NTFY_TOPIC not found. Please set it in your environment or a .env file.")
+        sys.exit(1)
+
+    # Webhooks replace polling when a secret is configured; without one, fall back to polling.
+    # Every target gets its own event queue, fed by the one shared webhook listener.
+    event_queues = {}
+    monitors = []
+    seen_targets = set()
+    for target in targets:
+        target_url = target["repo_url"]
+        if is_pr_url(target_url):
+            owner, repo, pr_number = parse_pr_url(target_url)
+            monitor = monitor_single_pr
+        else:
+            owner, repo = parse_repo_url(target_url)
+            pr_number = None
+            monitor = monitor_repository
+
+        # Two monitors of the same target and topic would share, and fight over, its state
+        target_key = (f"{owner}/{repo}".lower(), pr_number, target["ntfy_topic"])
+        if target_key in seen_targets:
+            print(f"⚠️ Skipping duplicate target {target_url} for topic {target['ntfy_topic']}.", file=sys.stderr)
+            continue
+        seen_targets.add(target_key)
+
+        api_base_url = get_api_base_url(target_url)
+        print(f"✅ API Endpoint set to: {api_base_url}")
+
+        repo_key = f"{owner}/{repo}".lower()
+        event_queue = None
+        if WEBHOOK_SECRET:
+            event_queue = asyncio.Queue()
+            event_queues.setdefault(repo_key, []).append(event_queue)
+        # The ntfy.sh URL is built once per target rather than on every notification.
+        ntfy_url = f"{NTFY_BASE_URL}/{target['ntfy_topic']}"
+        monitors.append((monitor, repo_key, target_url, api_base_url, ntfy_url, event_queue))
+
+    async def run_target(monitor, repo_key, event_queue, *args):
+        """Runs the monitor of one target, unregistering its event queue once it stops."""
+        try:
+            await monitor(*args, event_queue, poll)
+        finally:
+            # A stopped monitor no longer drains its queue, which would otherwise keep growing
+            if event_queue is not None:
+                event_queues[repo_key].remove(event_queue)
+
+    runner = await start_webhook_server(event_queues) if WEBHOOK_SECRET else None
+    poll = not WEBHOOK_SECRET or args.poll_fallback
+    if poll:
+        print(f"⏱️ Polling for changes every {POLL_INTERVAL}s, backing off up to {MAX_POLL_INTERVAL}s while idle.")
+
+    state = load_state()
+    # One pooled session for all requests. Idle connections are kept open past the poll
+    # interval so each tick reuses them instead of paying for a new TLS handshake.
+    # trust_env honors HTTP_PROXY/HTTPS_PROXY, like requests did.
+    connector = aiohttp.TCPConnector(limit=MAX_CONNECTIONS, keepalive_timeout=POLL_INTERVAL + 30)
+    async with aiohttp.ClientSession(connector=connector, trust_env=True) as session:
+        monitoring = asyncio.gather(*[
+            run_target(monitor, repo_key, event_queue, session, state, target_url, api_base_url, ntfy_url)
+            for monitor, repo_key, target_url, api_base_url, ntfy_url, event_queue in monitors
+        ])
+        # SIGINT and SIGTERM cancel the monitors, interrupting any sleep or webhook wait
+        # immediately. Where signal handlers are unsupported, Ctrl+C raises KeyboardInterrupt.
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, monitoring.cancel)
+            except NotImplementedError:
+                pass
+        try:
+            await monitoring
+        except asyncio.CancelledError:
+            print("\n🛑 Monitoring stopped.")
+        finally:
+            # Close the webhook listener's sockets before the event loop goes away
+            if runner is not None:
+                await runner.cleanup()
+
+def run():
+    """Runs the notifier until it is interrupted."""
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\n🛑 Monitoring stopped by user.")
+
+if __name__ == "__main__":
+    run()